@@ -0,0 +1,158 @@
+"""
+Exact EV computation for Blackjack by backward induction.
+Finished hands are scored from the same expected-result tables the Monte Carlo
+engines use, so both agree on the dealer's play and the payout rules.
+"""
+
+from functools import lru_cache
+from typing import Tuple
+
+from engine import (
+    Action, StatsTable, CARD_PROBS, DEALER_BJ_PROB, RESOLVE_EV, STATE_INDEX,
+    get_valid_actions
+)
+
+
+# Pseudo sample count stored for exact EVs, so sem() is effectively zero
+EXACT_N = 1e9
+
+
+def _add_card(total: int, is_soft: bool, card: int) -> Tuple[int, bool]:
+    """Return the (total, is_soft) of a hand after drawing card."""
+    total += card
+    aces = int(is_soft) + (card == 11)
+    while total > 21 and aces > 0:
+        total -= 10
+        aces -= 1
+    return total, aces > 0
+
+
+def dealer_blackjack_prob(upcard: int) -> float:
+    """Probability that the dealer's hole card completes a blackjack."""
+    return float(DEALER_BJ_PROB[upcard])
+
+
+def stand_ev(player_total: int, upcard: int) -> float:
+    """
+    EV per unit bet of standing on a final total (ENHC).
+
+    Args:
+        player_total: Player's final total (over 21 = bust)
+        upcard: Dealer's visible card
+
+    Returns:
+        Expected result, counting dealer blackjack as a full loss
+    """
+    return float(RESOLVE_EV[upcard, player_total])
+
+
+@lru_cache(maxsize=None)
+def hit_ev(total: int, is_soft: bool, upcard: int) -> float:
+    """
+    EV of hitting, then continuing with the best of hit/stand.
+
+    Args:
+        total: Player's current total
+        is_soft: Whether hand is soft
+        upcard: Dealer's visible card
+
+    Returns:
+        Expected result per unit bet
+    """
+    ev = 0.0
+    for card, p in CARD_PROBS.items():
+        new_total, new_soft = _add_card(total, is_soft, card)
+        if new_total > 21:
+            ev -= p
+        else:
+            ev += p * max(stand_ev(new_total, upcard), hit_ev(new_total, new_soft, upcard))
+    return ev
+
+
+@lru_cache(maxsize=None)
+def double_ev(total: int, is_soft: bool, upcard: int) -> float:
+    """EV of doubling down: one card at twice the stake."""
+    ev = 0.0
+    for card, p in CARD_PROBS.items():
+        new_total, _ = _add_card(total, is_soft, card)
+        ev += p * stand_ev(new_total, upcard)
+    return 2.0 * ev
+
+
+def surrender_ev(upcard: int) -> float:
+    """EV of late surrender; dealer blackjack still takes the full bet (ENHC)."""
+    p_bj = dealer_blackjack_prob(upcard)
+    return -0.5 * (1.0 - p_bj) - p_bj
+
+
+@lru_cache(maxsize=None)
+def split_ev(card: int, upcard: int) -> float:
+    """
+    EV of splitting a pair once (no resplits).
+    Split aces get one card each; other hands may hit, stand or double (DAS).
+
+    Args:
+        card: Value of the paired card (Ace = 11)
+        upcard: Dealer's visible card
+
+    Returns:
+        Combined expected result of both hands
+    """
+    start_total, start_soft = (11, True) if card == 11 else (card, False)
+
+    hand_ev = 0.0
+    for drawn, p in CARD_PROBS.items():
+        total, is_soft = _add_card(start_total, start_soft, drawn)
+        if card == 11:
+            hand_ev += p * stand_ev(total, upcard)
+        else:
+            hand_ev += p * max(stand_ev(total, upcard), hit_ev(total, is_soft, upcard),
+                               double_ev(total, is_soft, upcard))
+    return 2.0 * hand_ev
+
+
+def action_ev(state: Tuple[int, int, bool, bool], action: Action) -> float:
+    """
+    Exact EV of an action in a state.
+
+    Args:
+        state: (player_total, dealer_upcard, is_soft, is_pair)
+        action: Action to evaluate
+
+    Returns:
+        Expected result per initial unit bet
+    """
+    total, upcard, is_soft, is_pair = state
+
+    if action == Action.HIT:
+        return hit_ev(total, is_soft, upcard)
+    elif action == Action.STAND:
+        return stand_ev(total, upcard)
+    elif action == Action.DOUBLE:
+        return double_ev(total, is_soft, upcard)
+    elif action == Action.SPLIT:
+        return split_ev(11 if is_soft else total // 2, upcard)
+    elif action == Action.SURRENDER:
+        return surrender_ev(upcard)
+
+    raise ValueError(f"Unknown action: {action}")
+
+
+def solve_analytic() -> StatsTable:
+    """
+    Compute exact EVs for every valid state-action.
+
+    Results are stored as if from EXACT_N samples with zero variance, so the
+    table can be used anywhere Monte Carlo results are expected.
+
+    Returns:
+        StatsTable mapping states to StateStats
+    """
+    state_stats = StatsTable()
+
+    for state, si in STATE_INDEX.items():
+        for action in get_valid_actions(state[3]):
+            ev = action_ev(state, action)
+            state_stats.data[si, action] = (EXACT_N, ev * EXACT_N, ev * ev * EXACT_N)
+
+    return state_stats
@@ -2,11 +2,18 @@
 Analyze close EV decisions from the Blackjack simulation.
 """
 
-from typing import Dict, List, Tuple
-from engine import Action, ActionStats, StateStats, get_valid_actions
+from functools import lru_cache
+from typing import Callable, List, Tuple
+import numpy as np
+
+from engine import (
+    Action, StatsTable, ACTIONS, ACTION_CHAR, STATE_INDEX,
+    get_valid_action_ids, stats_ev, stats_sem
+)
 from main import run_simulation
 
 
+@lru_cache(maxsize=None)
 def format_state(state: Tuple[int, int, bool, bool]) -> str:
     """Format a state tuple as a readable string."""
     total, dealer, is_soft, is_pair = state
@@ -25,12 +32,12 @@ def format_state(state: Tuple[int, int, bool, bool]) -> str:
         return f"Hard {total} vs {dealer_str}"
 
 
-def analyze_close_decisions(state_stats: Dict, threshold: float = 0.02) -> List[dict]:
+def analyze_close_decisions(state_stats: StatsTable, threshold: float = 0.02) -> List[dict]:
     """
     Find decisions where EV difference between best and second-best is small.
 
     Args:
-        state_stats: Dictionary of state -> StateStats
+        state_stats: StatsTable of state -> StateStats
         threshold: Maximum EV difference to consider "close"
 
     Returns:
@@ -38,18 +45,21 @@ def analyze_close_decisions(state_stats: Dict, threshold: float = 0.02) -> List[
     """
     close_decisions = []
 
-    for state, ss in state_stats.items():
-        total, dealer, is_soft, is_pair = state
+    # Reduce the whole table once instead of per action
+    data = state_stats.data
+    n_all = data[..., 0]
+    ev_all = stats_ev(data)
+    sem_all = stats_sem(data)
 
-        # Get valid actions for this state
-        valid_actions = get_valid_actions(is_pair)
+    for state, si in STATE_INDEX.items():
+        total, dealer, is_soft, is_pair = state
 
-        # Get EVs for valid actions only
-        evs = []
-        for action in valid_actions:
-            stats = ss.actions[action]
-            if stats.n > 0:
-                evs.append((action, stats.ev(), stats.sem(), stats.n))
+        # Get EVs for simulated valid actions only
+        ids = get_valid_action_ids(is_pair)
+        ids = ids[n_all[si, ids] > 0]
+        evs = [(ACTIONS[ai], ev, sem, int(n))
+               for ai, ev, sem, n in zip(ids, ev_all[si, ids].tolist(),
+                                         sem_all[si, ids].tolist(), n_all[si, ids])]
 
         if len(evs) < 2:
             continue
@@ -93,125 +103,95 @@ def print_close_decisions(close_decisions: List[dict], max_show: int = 50) -> No
     print("-" * 90)
 
     for d in close_decisions[:max_show]:
-        all_evs_str = " | ".join([f"{a.value}:{ev:+.4f}" for a, ev, sem, n in d['all_evs']])
-        print(f"{d['state_str']:<20} {d['best'].value:>6} {d['best_ev']:>+8.4f} "
-              f"{d['second'].value:>6} {d['second_ev']:>+8.4f} {d['ev_diff']:>8.4f}   {all_evs_str}")
+        all_evs_str = " | ".join([f"{a.symbol}:{ev:+.4f}" for a, ev, sem, n in d['all_evs']])
+        print(f"{d['state_str']:<20} {d['best'].symbol:>6} {d['best_ev']:>+8.4f} "
+              f"{d['second'].symbol:>6} {d['second_ev']:>+8.4f} {d['ev_diff']:>8.4f}   {all_evs_str}")
 
     if len(close_decisions) > max_show:
         print(f"\n... and {len(close_decisions) - max_show} more close decisions")
 
 
-def print_all_ev_table(state_stats: Dict) -> None:
-    """Print complete EV table for all states."""
-
-    dealer_cards = ["2", "3", "4", "5", "6", "7", "8", "9", "10", "A"]
+# Columns of the hard/soft and pair EV tables
+_TOTALS_COLUMNS = ((Action.HIT, "Hit"), (Action.STAND, "Stand"),
+                   (Action.DOUBLE, "Double"), (Action.SURRENDER, "Surr"))
+_PAIRS_COLUMNS = ((Action.HIT, "Hit"), (Action.STAND, "Stand"), (Action.DOUBLE, "Double"),
+                  (Action.SPLIT, "Split"), (Action.SURRENDER, "Surr"))
 
-    print("\n" + "=" * 100)
-    print("COMPLETE EV TABLE - HARD TOTALS")
-    print("=" * 100)
 
-    for total in range(17, 4, -1):
-        print(f"\n--- Hard {total} ---")
-        print(f"{'Dealer':<8} {'Hit':>10} {'Stand':>10} {'Double':>10} {'Surr':>10} {'Best':>8}")
-        print("-" * 62)
+@lru_cache(maxsize=None)
+def _row_format(num_cells: int) -> Callable[..., str]:
+    """Fixed-width template for a (dealer, num_cells EV cells, best) row, built once."""
+    return ("{:<8}" + " {:>10}" * num_cells + " {:>8}").format
 
-        for dealer in range(2, 12):
-            dealer_str = "A" if dealer == 11 else str(dealer)
-            state = (total, dealer, False, False)
 
-            if state in state_stats:
-                ss = state_stats[state]
-                h_ev = ss.actions[Action.HIT].ev()
-                s_ev = ss.actions[Action.STAND].ev()
-                d_ev = ss.actions[Action.DOUBLE].ev()
-                r_ev = ss.actions[Action.SURRENDER].ev()
+def _format_row(row: Tuple[str, ...]) -> str:
+    """Render one (dealer, EV cells..., best) row as a fixed-width line."""
+    return _row_format(len(row) - 2)(*row)
 
-                best = max([(Action.HIT, h_ev), (Action.STAND, s_ev),
-                           (Action.DOUBLE, d_ev), (Action.SURRENDER, r_ev)],
-                          key=lambda x: x[1] if x[1] != float('-inf') else -999)
 
-                h_str = f"{h_ev:+.4f}" if h_ev != float('-inf') else "N/A"
-                s_str = f"{s_ev:+.4f}" if s_ev != float('-inf') else "N/A"
-                d_str = f"{d_ev:+.4f}" if d_ev != float('-inf') else "N/A"
-                r_str = f"{r_ev:+.4f}" if r_ev != float('-inf') else "N/A"
+def _ev_rows(cells: np.ndarray, best: np.ndarray,
+             total: int, is_soft: bool, is_pair: bool,
+             columns: Tuple[Tuple[Action, str], ...]) -> List[Tuple[str, ...]]:
+    """Build the rows of one hand's EV table from preformatted cells, one per dealer upcard."""
+    action_ids = [action for action, _ in columns]
+    rows = []
 
-                print(f"{dealer_str:<8} {h_str:>10} {s_str:>10} {d_str:>10} {r_str:>10} {best[0].value:>8}")
+    for dealer in range(2, 12):
+        state = (total, dealer, is_soft, is_pair)
+        if state not in STATE_INDEX:
+            continue
 
-    print("\n" + "=" * 100)
-    print("COMPLETE EV TABLE - SOFT TOTALS")
-    print("=" * 100)
+        si = STATE_INDEX[state]
+        dealer_str = "A" if dealer == 11 else str(dealer)
+        rows.append((dealer_str,) + tuple(cells[si, action_ids]) + (ACTION_CHAR[best[si]],))
 
-    for total in range(20, 12, -1):  # A,9 down to A,2 (A,10 is blackjack)
-        other = total - 11
-        print(f"\n--- Soft {total} (A,{other}) ---")
-        print(f"{'Dealer':<8} {'Hit':>10} {'Stand':>10} {'Double':>10} {'Surr':>10} {'Best':>8}")
-        print("-" * 62)
+    return rows
 
-        for dealer in range(2, 12):
-            dealer_str = "A" if dealer == 11 else str(dealer)
-            state = (total, dealer, True, False)
 
-            if state in state_stats:
-                ss = state_stats[state]
-                h_ev = ss.actions[Action.HIT].ev()
-                s_ev = ss.actions[Action.STAND].ev()
-                d_ev = ss.actions[Action.DOUBLE].ev()
-                r_ev = ss.actions[Action.SURRENDER].ev()
+def _print_ev_section(title: str, columns: Tuple[Tuple[Action, str], ...], rule: int,
+                      hands: List[Tuple[str, Tuple[int, bool, bool]]],
+                      cells: np.ndarray, best: np.ndarray) -> None:
+    """Print one section (hard, soft or pairs) of the complete EV table."""
+    header = _format_row(("Dealer",) + tuple(name for _, name in columns) + ("Best",))
 
-                best = max([(Action.HIT, h_ev), (Action.STAND, s_ev),
-                           (Action.DOUBLE, d_ev), (Action.SURRENDER, r_ev)],
-                          key=lambda x: x[1] if x[1] != float('-inf') else -999)
+    print("\n" + "=" * 100)
+    print(title)
+    print("=" * 100)
 
-                h_str = f"{h_ev:+.4f}" if h_ev != float('-inf') else "N/A"
-                s_str = f"{s_ev:+.4f}" if s_ev != float('-inf') else "N/A"
-                d_str = f"{d_ev:+.4f}" if d_ev != float('-inf') else "N/A"
-                r_str = f"{r_ev:+.4f}" if r_ev != float('-inf') else "N/A"
+    lines = []
+    for label, (total, is_soft, is_pair) in hands:
+        lines += [f"\n--- {label} ---", header, "-" * rule]
+        lines += [_format_row(row) for row in _ev_rows(cells, best, total, is_soft,
+                                                       is_pair, columns)]
+    print("\n".join(lines))
 
-                print(f"{dealer_str:<8} {h_str:>10} {s_str:>10} {d_str:>10} {r_str:>10} {best[0].value:>8}")
 
-    print("\n" + "=" * 100)
-    print("COMPLETE EV TABLE - PAIRS")
-    print("=" * 100)
+def print_all_ev_table(state_stats: StatsTable) -> None:
+    """Print complete EV table for all states."""
 
-    pair_order = [11, 10, 9, 8, 7, 6, 5, 4, 3, 2]
-    for card in pair_order:
-        if card == 11:
-            label = "A,A"
-            total = 12
-            is_soft = True
-        else:
-            label = f"{card},{card}"
-            total = card * 2
-            is_soft = False
-
-        print(f"\n--- {label} ---")
-        print(f"{'Dealer':<8} {'Hit':>10} {'Stand':>10} {'Double':>10} {'Split':>10} {'Surr':>10} {'Best':>8}")
-        print("-" * 74)
-
-        for dealer in range(2, 12):
-            dealer_str = "A" if dealer == 11 else str(dealer)
-            state = (total, dealer, is_soft, True)
-
-            if state in state_stats:
-                ss = state_stats[state]
-                h_ev = ss.actions[Action.HIT].ev()
-                s_ev = ss.actions[Action.STAND].ev()
-                d_ev = ss.actions[Action.DOUBLE].ev()
-                p_ev = ss.actions[Action.SPLIT].ev()
-                r_ev = ss.actions[Action.SURRENDER].ev()
-
-                evs = [(Action.HIT, h_ev), (Action.STAND, s_ev),
-                       (Action.DOUBLE, d_ev), (Action.SPLIT, p_ev),
-                       (Action.SURRENDER, r_ev)]
-                best = max(evs, key=lambda x: x[1] if x[1] != float('-inf') else -999)
-
-                h_str = f"{h_ev:+.4f}" if h_ev != float('-inf') else "N/A"
-                s_str = f"{s_ev:+.4f}" if s_ev != float('-inf') else "N/A"
-                d_str = f"{d_ev:+.4f}" if d_ev != float('-inf') else "N/A"
-                p_str = f"{p_ev:+.4f}" if p_ev != float('-inf') else "N/A"
-                r_str = f"{r_ev:+.4f}" if r_ev != float('-inf') else "N/A"
-
-                print(f"{dealer_str:<8} {h_str:>10} {s_str:>10} {d_str:>10} {p_str:>10} {r_str:>10} {best[0].value:>8}")
+    # EVs for every state-action, indexed [STATE_INDEX[state], action]
+    ev = stats_ev(state_stats.data)
+
+    # Best action id for every state in one pass (unsimulated actions are -inf)
+    best = ev.argmax(axis=1)
+
+    # Format every cell at once; unsimulated actions show as N/A
+    cells = np.where(np.isneginf(ev), "N/A", np.char.mod("%+.4f", ev))
+
+    hard_hands = [(f"Hard {total}", (total, False, False)) for total in range(17, 4, -1)]
+    # A,9 down to A,2 (A,10 is blackjack)
+    soft_hands = [(f"Soft {total} (A,{total - 11})", (total, True, False))
+                  for total in range(20, 12, -1)]
+    pair_hands = [("A,A", (12, True, True))] + [
+        (f"{card},{card}", (card * 2, False, True)) for card in range(10, 1, -1)
+    ]
+
+    _print_ev_section("COMPLETE EV TABLE - HARD TOTALS", _TOTALS_COLUMNS, 62,
+                      hard_hands, cells, best)
+    _print_ev_section("COMPLETE EV TABLE - SOFT TOTALS", _TOTALS_COLUMNS, 62,
+                      soft_hands, cells, best)
+    _print_ev_section("COMPLETE EV TABLE - PAIRS", _PAIRS_COLUMNS, 74,
+                      pair_hands, cells, best)
 
 
 def main():
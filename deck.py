@@ -4,13 +4,27 @@ Supports both finite 8-deck shoe and infinite deck modes.
 """
 
 import random
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 import numpy as np
 
 
 # Card values: 2-10 face value, J/Q/K = 10, A = 11 (handled specially)
 CARD_VALUES = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11]  # 2-10, J, Q, K, A
 
+# Lookup table for uniform rank sampling: index 0-12 maps straight to a card
+# value, so the 4/13 weight of ten-valued cards needs no explicit p= vector
+CARD_LOOKUP = np.array(CARD_VALUES, dtype=np.int8)
+
+# Fixed hand buffer size: no hand reaches 16 cards before standing or busting
+HAND_BUF = 16
+
+# Player action ids, shared by engine.Action and the batch engines
+HIT = 0
+STAND = 1
+DOUBLE = 2
+SPLIT = 3
+SURRENDER = 4
+
 
 class Shoe:
     """
@@ -28,39 +42,47 @@ class Shoe:
         """
         self.num_decks = num_decks
         self.penetration = penetration
-        self.cards: List[int] = []
+        self.cards: np.ndarray = np.empty(0, dtype=np.int8)
+        self._idx: int = 0  # Position of the next card to deal
         self.cut_card_position: int = 0
+        self.rng = np.random.default_rng()
         self.shuffle()
 
     def shuffle(self) -> None:
         """Shuffle all cards back into the shoe."""
         # Each deck has 4 of each card value (4 suits)
-        single_deck = CARD_VALUES * 4
-        self.cards = single_deck * self.num_decks
-        random.shuffle(self.cards)
+        single_deck = np.array(CARD_VALUES * 4, dtype=np.int8)
+        self.cards = np.tile(single_deck, self.num_decks)
+        self.rng.shuffle(self.cards)
+        self._idx = 0
         # Cut card position - reshuffle after this many cards dealt
         self.cut_card_position = int(len(self.cards) * self.penetration)
 
     def needs_shuffle(self) -> bool:
         """Check if shoe needs reshuffling based on penetration."""
-        cards_dealt = (self.num_decks * 52) - len(self.cards)
-        return cards_dealt >= self.cut_card_position
+        return self._idx >= self.cut_card_position
 
     def draw(self) -> int:
         """Draw a card from the shoe."""
-        if not self.cards:
+        if self._idx >= len(self.cards):
             self.shuffle()
-        return self.cards.pop()
+        card = int(self.cards[self._idx])
+        self._idx += 1
+        return card
 
     def draw_specific(self, value: int) -> Optional[int]:
         """
         Draw a specific card value from the shoe (for testing/setup).
         Returns None if card not available.
         """
-        if value in self.cards:
-            self.cards.remove(value)
-            return value
-        return None
+        found = np.flatnonzero(self.cards[self._idx:] == value)
+        if len(found) == 0:
+            return None
+        # Swap the card into the deal position so the undealt cards stay contiguous
+        pos = self._idx + found[0]
+        self.cards[pos], self.cards[self._idx] = self.cards[self._idx], self.cards[pos]
+        self._idx += 1
+        return value
 
 
 class InfiniteDeck:
@@ -69,15 +91,12 @@ class InfiniteDeck:
     Used for computing base strategy (no card counting effects).
     """
 
-    # Probability weights for each card value
-    # 2-9: 1/13 each, 10/J/Q/K: 4/13, A: 1/13
-    WEIGHTS = np.array([1, 1, 1, 1, 1, 1, 1, 1, 4, 1], dtype=np.float64)
-    WEIGHTS = WEIGHTS / WEIGHTS.sum()
-    VALUES = np.array([2, 3, 4, 5, 6, 7, 8, 9, 10, 11])
+    # One entry per rank: 2-9 and A at 1/13 each, 10/J/Q/K together at 4/13
+    _DECK = CARD_LOOKUP
 
     def __init__(self):
         """Initialize infinite deck."""
-        pass
+        self.rng = np.random.default_rng()
 
     def shuffle(self) -> None:
         """No-op for infinite deck."""
@@ -89,25 +108,38 @@ class InfiniteDeck:
 
     def draw(self) -> int:
         """Draw a random card with correct probability distribution."""
-        return int(np.random.choice(self.VALUES, p=self.WEIGHTS))
+        return int(self._DECK[int(13.0 * random.random())])
+
+    def draw_many(self, n: int) -> np.ndarray:
+        """Draw n cards at once with a single vectorized RNG call."""
+        return self._DECK[self.rng.integers(0, 13, size=n, dtype=np.int8)]
 
     def draw_specific(self, value: int) -> int:
         """For infinite deck, always returns the requested value."""
         return value
 
 
-def hand_value(cards: List[int]) -> tuple:
+def hand_value(cards: Sequence[int], n: Optional[int] = None) -> tuple:
     """
     Calculate the value of a hand.
 
     Args:
-        cards: List of card values (Ace = 11)
+        cards: Card buffer (Ace = 11); only the first n entries are used
+        n: Number of cards in the hand (default: len(cards))
 
     Returns:
         (total, is_soft): Total value and whether hand is soft
     """
-    total = sum(cards)
-    aces = cards.count(11)
+    if n is None:
+        n = len(cards)
+
+    # Single pass for the raw total and ace count
+    total = 0
+    aces = 0
+    for i in range(n):
+        v = cards[i]
+        total += v
+        aces += (v == 11)
 
     # Convert aces from 11 to 1 as needed to avoid bust
     while total > 21 and aces > 0:
@@ -120,23 +152,46 @@ def hand_value(cards: List[int]) -> tuple:
     return total, is_soft
 
 
-def is_blackjack(cards: List[int]) -> bool:
+def hand_value_fast(a: int, b: int) -> Tuple[int, bool]:
+    """
+    Calculate the value of a two-card hand.
+
+    Specialization of hand_value() for the common initial-hand case:
+    at most one ace ever needs converting (A,A).
+
+    Returns:
+        (total, is_soft): Total value and whether hand is soft
+    """
+    total = a + b
+    aces = (a == 11) + (b == 11)
+    if total > 21 and aces:
+        total -= 10
+        aces -= 1
+    return total, aces > 0 and total <= 21
+
+
+def is_blackjack(cards: Sequence[int], n: Optional[int] = None) -> bool:
     """Check if hand is a natural blackjack (Ace + 10-value on first 2 cards)."""
-    if len(cards) != 2:
+    if n is None:
+        n = len(cards)
+    if n != 2:
         return False
-    total, _ = hand_value(cards)
-    return total == 21
+    a = cards[0]
+    b = cards[1]
+    return a + b == 21 and (a == 11 or b == 11)
 
 
-def is_bust(cards: List[int]) -> bool:
+def is_bust(cards: Sequence[int], n: Optional[int] = None) -> bool:
     """Check if hand is busted (over 21)."""
-    total, _ = hand_value(cards)
+    total, _ = hand_value(cards, n)
     return total > 21
 
 
-def is_pair(cards: List[int]) -> bool:
+def is_pair(cards: Sequence[int], n: Optional[int] = None) -> bool:
     """Check if hand is a splittable pair."""
-    return len(cards) == 2 and cards[0] == cards[1]
+    if n is None:
+        n = len(cards)
+    return n == 2 and cards[0] == cards[1]
 
 
 def get_state(player_cards: List[int], dealer_upcard: int) -> tuple:
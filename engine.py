@@ -3,411 +3,423 @@ Monte Carlo Blackjack simulation engine.
 Handles all game logic and EV calculations.
 """
 
-import math
-from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass, field
-from enum import Enum
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple, Optional
+from enum import IntEnum
 import numpy as np
 
-from deck import InfiniteDeck, hand_value, is_blackjack, is_bust
+import deck
+from deck import hand_value
+import engine_np
 
+try:
+    import engine_nb
+except ImportError:  # Numba not installed: simulate batches with vectorized NumPy
+    engine_nb = None
 
-class Action(Enum):
-    """Possible player actions."""
-    HIT = "H"
-    STAND = "S"
-    DOUBLE = "D"
-    SPLIT = "P"
-    SURRENDER = "R"
 
+# Hands simulated between early-stopping convergence checks
+CHECK_EVERY = 512
 
-@dataclass
-class ActionStats:
-    """Statistics for a single action in a state."""
-    n: int = 0
-    sum_x: float = 0.0
-    sum_x_squared: float = 0.0
+# Hands per vectorized NumPy pass when stopping early; each pass has a fixed
+# overhead, so the NumPy path checks convergence far less often than Numba
+NP_CHECK_EVERY = 4096
 
-    def update(self, result: float) -> None:
-        """Update statistics with a new result."""
-        self.n += 1
-        self.sum_x += result
-        self.sum_x_squared += result * result
+# Infinite-deck draw probabilities by card value (Ace = 11)
+CARD_PROBS = {v: (4 if v == 10 else 1) / 13 for v in range(2, 12)}
 
-    def ev(self) -> float:
-        """Calculate expected value (mean return)."""
-        if self.n == 0:
-            return float('-inf')  # Unsimulated actions should never be selected
-        return self.sum_x / self.n
+# Final dealer outcomes: totals 17-21, then bust (stored as 22)
+DEALER_TOTALS = (17, 18, 19, 20, 21, 22)
 
-    def variance(self) -> float:
-        """Calculate variance."""
-        if self.n < 2:
-            return float('inf')
-        mean = self.sum_x / self.n
-        return (self.sum_x_squared / self.n) - (mean * mean)
 
-    def sem(self) -> float:
-        """Calculate Standard Error of the Mean."""
-        if self.n < 2:
-            return float('inf')
-        var = self.variance()
-        if var < 0:  # Numerical stability
-            var = 0
-        return math.sqrt(var / self.n)
+@lru_cache(maxsize=None)
+def _dealer_outcomes(hard_total: int, has_ace: bool) -> Tuple[float, ...]:
+    """
+    Distribution of final dealer outcomes from a hand, by exact expansion of
+    the S17 hitting tree under infinite-deck probabilities.
 
-    def merge(self, other: 'ActionStats') -> None:
-        """Merge statistics from another ActionStats object."""
-        self.n += other.n
-        self.sum_x += other.sum_x
-        self.sum_x_squared += other.sum_x_squared
+    Args:
+        hard_total: Hand total counting every ace as 1
+        has_ace: Whether the hand holds an ace (which may count as 11)
+    """
+    total = hard_total + 10 if has_ace and hard_total <= 11 else hard_total
+    if total > 21:
+        return (0.0,) * 5 + (1.0,)
+    if total >= 17:
+        dist = [0.0] * 6
+        dist[total - 17] = 1.0
+        return tuple(dist)
 
+    dist = [0.0] * 6
+    for v, p in CARD_PROBS.items():
+        sub = _dealer_outcomes(hard_total + (1 if v == 11 else v), has_ace or v == 11)
+        for k in range(6):
+            dist[k] += p * sub[k]
+    return tuple(dist)
 
-@dataclass
-class StateStats:
-    """Statistics for all actions in a given state."""
-    actions: Dict[Action, ActionStats] = field(default_factory=dict)
 
-    def __post_init__(self):
-        # Initialize stats for all actions
-        for action in Action:
-            if action not in self.actions:
-                self.actions[action] = ActionStats()
+def _build_dealer_dist() -> np.ndarray:
+    """Final dealer outcome distribution for every (upcard, hole) pair, shape (12, 12, 6)."""
+    dist = np.zeros((12, 12, len(DEALER_TOTALS)), dtype=np.float64)
+    for up in range(2, 12):
+        for hole in range(2, 12):
+            hard = (1 if up == 11 else up) + (1 if hole == 11 else hole)
+            dist[up, hole] = _dealer_outcomes(hard, up == 11 or hole == 11)
+    return dist
 
-    def best_action(self) -> Tuple[Action, float]:
-        """Return the action with highest EV and its value."""
-        best = max(self.actions.items(), key=lambda x: x[1].ev())
-        return best[0], best[1].ev()
 
-    def all_converged(self, target_sem: float) -> bool:
-        """Check if all actions have converged to target SEM."""
-        return all(stats.sem() < target_sem for stats in self.actions.values())
+# Dealer play depends only on (upcard, hole) with an infinite deck, so its
+# outcome distribution is computed once instead of simulated per hand
+DEALER_DIST = _build_dealer_dist()
 
-    def needs_simulation(self, action: Action, target_sem: float) -> bool:
-        """Check if an action still needs more simulation."""
-        return self.actions[action].sem() >= target_sem
+# Largest total a finished player hand can reach (hard 21 doubling into a ten)
+MAX_PLAYER_TOTAL = 31
 
 
-class BlackjackEngine:
+def _build_resolve_ev() -> np.ndarray:
     """
-    Monte Carlo simulation engine for Blackjack.
-    Implements Evolution Gaming rules (S17, DAS, ENHC).
+    Expected result of a finished hand against the dealer (ENHC), by
+    (upcard, hole, player total), shape (12, 12, MAX_PLAYER_TOTAL + 1).
+    A dealer blackjack takes the bet and busted totals lose.
     """
+    totals = np.arange(MAX_PLAYER_TOTAL + 1)[:, None]
+    dealer_totals = np.array(DEALER_TOTALS)[None, :]
+    # Win/lose masks instead of a chain of comparisons; a player bust loses
+    # even when the dealer busts too
+    player_bust = totals > 21
+    dealer_bust = dealer_totals > 21
+    win = ~player_bust & (dealer_bust | (totals > dealer_totals))
+    lose = player_bust | (~dealer_bust & (totals < dealer_totals))
+    payoff = win.astype(np.int8) - lose.astype(np.int8)
+    ev = np.einsum("uhk,tk->uht", DEALER_DIST, payoff)
 
-    def __init__(self, use_infinite_deck: bool = True):
-        """
-        Initialize engine.
+    cards = np.arange(12)
+    ev[cards[:, None] + cards[None, :] == 21] = -1.0
+    return ev
 
-        Args:
-            use_infinite_deck: If True, use infinite deck (recommended for base strategy)
-        """
-        self.deck = InfiniteDeck()
-        self.use_infinite_deck = use_infinite_deck
 
-    def dealer_play(self, dealer_cards: List[int]) -> List[int]:
-        """
-        Play out dealer's hand according to S17 rules.
-        Dealer stands on all 17s (including soft 17).
+# Hole card probabilities, indexed by card value
+HOLE_PROBS = np.array([CARD_PROBS.get(v, 0.0) for v in range(12)])
 
-        Args:
-            dealer_cards: Dealer's starting cards
+# Expected results replace dealer draws entirely: by (upcard, hole, total) once
+# the hole card is known, and by (upcard, total) averaged over the hole card
+RESOLVE_EV_BY_HOLE = _build_resolve_ev()
+RESOLVE_EV = np.einsum("uht,h->ut", RESOLVE_EV_BY_HOLE, HOLE_PROBS)
+# float32 copy for the NumPy batch path, whose per-hand results are float32
+RESOLVE_EV_F32 = RESOLVE_EV.astype(np.float32)
 
-        Returns:
-            Final dealer hand
-        """
-        cards = dealer_cards.copy()
+# Probability that the hole card completes a dealer blackjack, by upcard
+DEALER_BJ_PROB = np.array([CARD_PROBS.get(21 - up, 0.0) for up in range(12)])
 
-        while True:
-            total, is_soft = hand_value(cards)
 
-            # S17: Dealer stands on all 17s
-            if total >= 17:
-                break
+class Action(IntEnum):
+    """
+    Possible player actions.
+    Members are plain ints, so they index the action axis of stats arrays
+    directly and match the action ids used by the compiled kernels.
+    """
+    HIT = deck.HIT
+    STAND = deck.STAND
+    DOUBLE = deck.DOUBLE
+    SPLIT = deck.SPLIT
+    SURRENDER = deck.SURRENDER
 
-            # Draw another card
-            cards.append(self.deck.draw())
+    @property
+    def symbol(self) -> str:
+        """Single-letter strategy chart symbol."""
+        return ACTION_CHAR[self]
 
-        return cards
 
-    def play_hand_hit(self, player_cards: List[int], dealer_upcard: int,
-                      dealer_hole: int) -> float:
-        """
-        Simulate hitting (drawing one card and continuing optimally).
-        For Monte Carlo, we use a simple strategy after the hit.
+# Display symbols, indexed by action id
+ACTION_CHAR = "HSDPR"
 
-        Args:
-            player_cards: Current player cards
-            dealer_upcard: Dealer's visible card
-            dealer_hole: Dealer's hole card
+ACTIONS = tuple(Action)
+NUM_ACTIONS = len(Action)
 
-        Returns:
-            Result of the hand (-1 to +1.5)
-        """
-        cards = player_cards.copy()
-        cards.append(self.deck.draw())
+# Statistics are stored as float64 triples (n, sum_x, sum_x_squared) in the
+# last axis of an array, so whole tables can be merged and reduced at once
 
-        if is_bust(cards):
-            return -1.0
 
-        # After hitting, continue with approximate basic strategy
-        while True:
-            total, is_soft = hand_value(cards)
+def stats_ev(data: np.ndarray) -> np.ndarray:
+    """Vectorized expected value over (..., 3) statistics; -inf where unsimulated."""
+    n = data[..., 0]
+    ev = data[..., 1] / np.maximum(n, 1)
+    return np.where(n > 0, ev, -np.inf)
 
-            # Always stand on 17+
-            if total >= 17:
-                break
 
-            # Soft hand strategy
-            if is_soft:
-                # Stand on soft 18+ (already covered by >= 17 check for soft 19+)
-                if total >= 18:
-                    break
-                # Hit soft 17 or less
-            else:
-                # Hard hand strategy
-                if total >= 17:
-                    break
-                # Stand on 12-16 vs dealer 2-6
-                if total >= 12 and dealer_upcard in [2, 3, 4, 5, 6]:
-                    break
-                # Hit on 12-16 vs dealer 7+ (continue loop)
-                # Always hit on 11 or less (continue loop)
+def stats_variance(data: np.ndarray) -> np.ndarray:
+    """Vectorized variance over (..., 3) statistics; inf with fewer than 2 samples."""
+    n = data[..., 0]
+    safe_n = np.maximum(n, 1)
+    mean = data[..., 1] / safe_n
+    var = data[..., 2] / safe_n - mean * mean
+    return np.where(n >= 2, var, np.inf)
 
-            cards.append(self.deck.draw())
-            if is_bust(cards):
-                return -1.0
 
-        return self._resolve_vs_dealer(cards, dealer_upcard, dealer_hole)
+def stats_sem(data: np.ndarray) -> np.ndarray:
+    """Vectorized Standard Error of the Mean over (..., 3) statistics."""
+    n = data[..., 0]
+    var = np.maximum(stats_variance(data), 0)  # Numerical stability
+    return np.sqrt(var / np.maximum(n, 1))
 
-    def play_hand_stand(self, player_cards: List[int], dealer_upcard: int,
-                        dealer_hole: int) -> float:
-        """
-        Simulate standing.
 
-        Args:
-            player_cards: Current player cards
-            dealer_upcard: Dealer's visible card
-            dealer_hole: Dealer's hole card
+class ActionStats:
+    """Statistics for a single action in a state, stored in a length-3 array row."""
 
-        Returns:
-            Result of the hand (-1 to +1)
-        """
-        return self._resolve_vs_dealer(player_cards, dealer_upcard, dealer_hole)
+    __slots__ = ("data",)
 
-    def play_hand_double(self, player_cards: List[int], dealer_upcard: int,
-                         dealer_hole: int) -> float:
+    def __init__(self, n: int = 0, sum_x: float = 0.0, sum_x_squared: float = 0.0,
+                 data: Optional[np.ndarray] = None):
         """
-        Simulate doubling down.
+        Initialize statistics.
 
         Args:
-            player_cards: Current player cards
-            dealer_upcard: Dealer's visible card
-            dealer_hole: Dealer's hole card
-
-        Returns:
-            Result of the hand (-2 to +2)
+            n, sum_x, sum_x_squared: Initial values for a standalone row
+            data: Existing (3,) array row to view instead (e.g. a StatsTable slice)
         """
-        cards = player_cards.copy()
-        cards.append(self.deck.draw())
+        if data is None:
+            data = np.array([n, sum_x, sum_x_squared], dtype=np.float64)
+        self.data = data
 
-        if is_bust(cards):
-            return -2.0
+    @property
+    def n(self) -> int:
+        return int(self.data[0])
 
-        result = self._resolve_vs_dealer(cards, dealer_upcard, dealer_hole)
-        return result * 2.0
+    @property
+    def sum_x(self) -> float:
+        return float(self.data[1])
 
-    def play_hand_split(self, player_cards: List[int], dealer_upcard: int,
-                        dealer_hole: int, can_double: bool = True) -> float:
-        """
-        Simulate splitting a pair.
-        Only one split allowed (2 hands max).
-        Split aces receive only 1 card each.
+    @property
+    def sum_x_squared(self) -> float:
+        return float(self.data[2])
 
-        Args:
-            player_cards: Current player cards (must be a pair)
-            dealer_upcard: Dealer's visible card
-            dealer_hole: Dealer's hole card
-            can_double: Whether doubling is allowed on split hands (DAS)
+    def update(self, result: float) -> None:
+        """Update statistics with a new result."""
+        self.data += (1.0, result, result * result)
 
-        Returns:
-            Combined result of both hands
-        """
-        if len(player_cards) != 2 or player_cards[0] != player_cards[1]:
-            raise ValueError("Cannot split non-pair")
+    def ev(self) -> float:
+        """Calculate expected value (mean return)."""
+        n = self.data[0]
+        if n == 0:
+            return float('-inf')  # Unsimulated actions should never be selected
+        return float(self.data[1] / n)
 
-        split_card = player_cards[0]
-        is_aces = (split_card == 11)
+    def variance(self) -> float:
+        """Calculate variance."""
+        return float(stats_variance(self.data))
 
-        total_result = 0.0
+    def sem(self) -> float:
+        """Calculate Standard Error of the Mean."""
+        return float(stats_sem(self.data))
 
-        for _ in range(2):
-            hand = [split_card, self.deck.draw()]
+    def merge(self, other: 'ActionStats') -> None:
+        """Merge statistics from another ActionStats object."""
+        self.data += other.data
 
-            if is_aces:
-                # Split aces: only one card, no further action
-                result = self._resolve_vs_dealer(hand, dealer_upcard, dealer_hole)
-            else:
-                # Play the hand with basic strategy
-                result = self._play_split_hand(hand, dealer_upcard, dealer_hole, can_double)
+    def __repr__(self) -> str:
+        return (f"ActionStats(n={self.n}, sum_x={self.sum_x}, "
+                f"sum_x_squared={self.sum_x_squared})")
 
-            total_result += result
 
-        return total_result
+class StateStats:
+    """Statistics for all actions in a given state, stored in a (NUM_ACTIONS, 3) array."""
 
-    def _play_split_hand(self, hand: List[int], dealer_upcard: int,
-                         dealer_hole: int, can_double: bool) -> float:
+    def __init__(self, data: Optional[np.ndarray] = None):
         """
-        Play a single split hand with simplified strategy.
-        After split, play using basic hit/stand/double logic.
+        Initialize statistics.
+
+        Args:
+            data: Existing (NUM_ACTIONS, 3) array to view instead of allocating
         """
-        total, is_soft = hand_value(hand)
-
-        # Check if we should double (only on 2 cards with DAS)
-        if can_double and len(hand) == 2:
-            # Simple doubling logic: double on 9, 10, 11, soft 16-18
-            should_double = False
-            if not is_soft and total in [9, 10, 11]:
-                should_double = True
-            elif is_soft and total in [16, 17, 18]:
-                should_double = True
-
-            if should_double:
-                hand.append(self.deck.draw())
-                if is_bust(hand):
-                    return -2.0
-                return self._resolve_vs_dealer(hand, dealer_upcard, dealer_hole) * 2.0
-
-        # Hit until we reach standing threshold
-        while True:
-            total, is_soft = hand_value(hand)
-
-            # Standing thresholds
-            if is_soft:
-                if total >= 18:
-                    break
-            else:
-                if total >= 17:
-                    break
-                # Stand on 12-16 vs dealer 2-6
-                if total >= 12 and dealer_upcard in [2, 3, 4, 5, 6]:
-                    break
+        if data is None:
+            data = np.zeros((NUM_ACTIONS, 3), dtype=np.float64)
+        self.data = data
+        # Indexed by Action, which is an IntEnum, so lookups skip hashing
+        self.actions: List[ActionStats] = [ActionStats(data=row) for row in data]
 
-            hand.append(self.deck.draw())
-            if is_bust(hand):
-                return -1.0
+    def best_action(self) -> Tuple[Action, float]:
+        """Return the action with highest EV and its value."""
+        evs = stats_ev(self.data)
+        best = int(np.argmax(evs))
+        return ACTIONS[best], float(evs[best])
 
-        return self._resolve_vs_dealer(hand, dealer_upcard, dealer_hole)
+    def all_converged(self, target_sem: float) -> bool:
+        """Check if all actions have converged to target SEM."""
+        return bool(np.all(stats_sem(self.data) < target_sem))
 
-    def _resolve_vs_dealer(self, player_cards: List[int], dealer_upcard: int,
-                           dealer_hole: int) -> float:
-        """
-        Resolve player hand against dealer after player is done.
-        Implements ENHC (European No Hole Card) rule.
+    def needs_simulation(self, action: Action, target_sem: float) -> bool:
+        """Check if an action still needs more simulation."""
+        return self.actions[action].sem() >= target_sem
 
-        Args:
-            player_cards: Final player hand
-            dealer_upcard: Dealer's visible card
-            dealer_hole: Dealer's hole card
 
-        Returns:
-            Result: +1.5 (BJ), +1 (win), 0 (push), -1 (loss)
-        """
-        player_total, _ = hand_value(player_cards)
-
-        # ENHC: Check if dealer has blackjack
-        dealer_cards = [dealer_upcard, dealer_hole]
-        if is_blackjack(dealer_cards):
-            # Player loses everything (including doubles/splits)
-            # The -1 here represents the base bet loss
-            # Double/split multipliers are handled in calling functions
-            return -1.0
-
-        # Play out dealer's hand
-        dealer_cards = self.dealer_play(dealer_cards)
-        dealer_total, _ = hand_value(dealer_cards)
-
-        # Compare hands
-        if is_bust(dealer_cards):
-            return 1.0
-        elif player_total > dealer_total:
-            return 1.0
-        elif player_total < dealer_total:
-            return -1.0
-        else:
-            return 0.0
+class StatsTable(dict):
+    """
+    Mapping of every state to its StateStats, backed by one contiguous
+    (num_states, NUM_ACTIONS, 3) float64 array.
+
+    Rows follow STATE_INDEX, so vectorized code can work on `data` directly
+    while per-state access keeps the dict interface.
+    """
 
-    def simulate_action(self, player_cards: List[int], dealer_upcard: int,
-                        action: Action) -> float:
+    def __init__(self, data: Optional[np.ndarray] = None):
         """
-        Simulate a single hand with the given action.
+        Initialize table.
 
         Args:
-            player_cards: Player's initial cards
-            dealer_upcard: Dealer's up card
-            action: Action to take
+            data: Existing statistics array to wrap (default: zeros)
+        """
+        if data is None:
+            data = np.zeros((len(STATE_INDEX), NUM_ACTIONS, 3), dtype=np.float64)
+        # STATE_INDEX numbers the states in order, so they pair up with the rows;
+        # building from one iterable sizes the dict once instead of growing it
+        super().__init__(zip(STATE_INDEX, map(StateStats, data)))
+        self.data = data
 
-        Returns:
-            Result of the hand
+    def best_actions(self) -> np.ndarray:
+        """Best action id for every state row, in one vectorized pass."""
+        return np.argmax(stats_ev(self.data), axis=1)
+
+
+class BlackjackEngine:
+    """
+    Monte Carlo simulation engine for Blackjack.
+    Implements Evolution Gaming rules (S17, DAS, ENHC).
+
+    Hands are played in whole batches, by the compiled kernels in engine_nb or
+    by the vectorized NumPy fallback in engine_np.
+    """
+
+    def __init__(self, use_infinite_deck: bool = True):
         """
-        # Draw dealer's hole card
-        dealer_hole = self.deck.draw()
-
-        # Check for player blackjack (only relevant for initial deal)
-        if len(player_cards) == 2 and is_blackjack(player_cards):
-            # Check dealer blackjack
-            dealer_cards = [dealer_upcard, dealer_hole]
-            if is_blackjack(dealer_cards):
-                return 0.0  # Push
-            return 1.5  # Blackjack pays 3:2
-
-        if action == Action.HIT:
-            return self.play_hand_hit(player_cards, dealer_upcard, dealer_hole)
-        elif action == Action.STAND:
-            return self.play_hand_stand(player_cards, dealer_upcard, dealer_hole)
-        elif action == Action.DOUBLE:
-            return self.play_hand_double(player_cards, dealer_upcard, dealer_hole)
-        elif action == Action.SPLIT:
-            return self.play_hand_split(player_cards, dealer_upcard, dealer_hole)
-        elif action == Action.SURRENDER:
-            # Late surrender: lose half bet
-            # With ENHC, if dealer has BJ, player loses full bet even on surrender
-            dealer_cards = [dealer_upcard, dealer_hole]
-            if is_blackjack(dealer_cards):
-                return -1.0  # Lose full bet to dealer blackjack
-            return -0.5  # Normal surrender
+        Initialize engine.
 
-        raise ValueError(f"Unknown action: {action}")
+        Args:
+            use_infinite_deck: If True, use infinite deck (recommended for base strategy)
+        """
+        self.use_infinite_deck = use_infinite_deck
+        # PCG64 generator for the NumPy batch path
+        self.rng = np.random.default_rng()
 
-    def simulate_batch(self, player_cards: List[int], dealer_upcard: int,
-                       action: Action, batch_size: int = 10000) -> ActionStats:
+    def simulate_batch(self, player_cards: Sequence[int], dealer_upcard: int,
+                       action: Action, batch_size: int = 10000, target_sem: float = 0.0,
+                       prior: Optional[np.ndarray] = None,
+                       entropy: Optional[Sequence[int]] = None) -> Tuple[int, float, float]:
         """
         Simulate a batch of hands for a given state-action pair.
+        Only the player's cards are drawn; finished hands are scored from
+        RESOLVE_EV, which averages over the hole card and the dealer's play.
+
+        With a target_sem, the SEM of prior plus the new results is checked every
+        CHECK_EVERY hands (NP_CHECK_EVERY without Numba) and the batch stops
+        early once it is below the target. Without one, the whole batch runs in
+        a single pass.
+
+        Batches given the same entropy draw the same card stream (common random
+        numbers), which makes runs reproducible and correlates the actions of a
+        state. It does not shrink any single action's SEM, so with the
+        per-action target_sem rule it does not reduce the hands simulated.
 
         Args:
             player_cards: Player's initial cards
             dealer_upcard: Dealer's up card
             action: Action to take
-            batch_size: Number of hands to simulate
+            batch_size: Maximum number of hands to simulate
+            target_sem: SEM at which to stop early (0 = always run the full batch)
+            prior: (n, sum_x, sum_x_squared) already collected for this
+                state-action, e.g. a row of a StatsTable's data
+            entropy: Seed material for the batch's generators (default: fresh entropy)
 
         Returns:
-            ActionStats with results
+            (n, sum_x, sum_x_squared) of the hands actually simulated, as plain
+            numbers so callers can add them straight into a statistics array
         """
-        stats = ActionStats()
+        if prior is None:
+            prior = np.zeros(3)
+        if action == Action.SPLIT and (len(player_cards) != 2
+                                       or player_cards[0] != player_cards[1]):
+            raise ValueError("Cannot split non-pair")
 
-        for _ in range(batch_size):
-            result = self.simulate_action(player_cards.copy(), dealer_upcard, action)
-            stats.update(result)
+        # Player blackjack, stand and surrender have a fixed expected result, so
+        # report the batch the engines would produce without playing any hands:
+        # one CHECK_EVERY round when stopping early (the SEM is already zero)
+        if len(player_cards) == 2 and player_cards[0] + player_cards[1] == 21:
+            result = 1.5 * (1.0 - DEALER_BJ_PROB[dealer_upcard])
+        elif action == Action.STAND:
+            result = RESOLVE_EV[dealer_upcard, hand_value(player_cards)[0]]
+        elif action == Action.SURRENDER:
+            result = -0.5 - 0.5 * DEALER_BJ_PROB[dealer_upcard]
+        else:
+            result = None
+        if result is not None:
+            n = min(batch_size, CHECK_EVERY) if target_sem > 0 else batch_size
+            return n, float(n * result), float(n * result * result)
+
+        if engine_nb is None:
+            rng = self.rng if entropy is None else np.random.default_rng(entropy)
+            step = NP_CHECK_EVERY if target_sem > 0 else batch_size
+            n, sum_x, sum_x_squared = 0, 0.0, 0.0
+            while n < batch_size:
+                dn, dsum, dsum_squared = engine_np.simulate_batch_np(
+                    player_cards, dealer_upcard, int(action),
+                    min(step, batch_size - n), RESOLVE_EV_F32,
+                    float(DEALER_BJ_PROB[dealer_upcard]), rng
+                )
+                n += dn
+                sum_x += dsum
+                sum_x_squared += dsum_squared
+                stats = (n, sum_x, sum_x_squared)
+                if target_sem > 0 and stats_sem(prior + stats) < target_sem:
+                    break
+            return n, sum_x, sum_x_squared
+
+        prior_n, prior_sum, prior_sum_squared = (float(x) for x in prior)
+        player = np.array(player_cards, dtype=np.int8)
+        batch_seed = np.random.SeedSequence(entropy).generate_state(1, dtype=np.uint64)[0]
+        # Without a target there is nothing to check, so run one parallel round;
+        # otherwise each round must give every kernel thread a chunk
+        if target_sem > 0:
+            from numba import get_num_threads
+            check_every = max(CHECK_EVERY, engine_nb.TRIALS_PER_CHUNK * get_num_threads())
+        else:
+            check_every = batch_size
+        return engine_nb.BATCH_KERNELS[action](
+            player, dealer_upcard, batch_size, batch_seed, RESOLVE_EV,
+            float(DEALER_BJ_PROB[dealer_upcard]), check_every, float(target_sem),
+            prior_n, prior_sum, prior_sum_squared
+        )
 
-        return stats
 
+def set_kernel_threads(num_threads: int) -> None:
+    """
+    Limit the threads the parallel Numba kernels use in the calling process.
+    Does nothing when Numba is not installed.
 
-def generate_all_states() -> List[Tuple[int, int, bool, bool]]:
+    Args:
+        num_threads: Thread count, at most the number of CPUs
     """
-    Generate all possible player states.
+    if engine_nb is not None:
+        from numba import set_num_threads
+        set_num_threads(num_threads)
 
-    Returns:
-        List of (player_total, dealer_upcard, is_soft, is_pair) tuples
+
+def warmup_kernels() -> None:
+    """
+    Compile the Numba kernels (or load them from the cache) with a one-hand
+    batch of every action that simulate_batch plays out.
+
+    Call this once per worker process after it starts, so the first real batch
+    is not charged for compilation. Running a parallel kernel starts Numba's
+    thread pool, which is not fork-safe, so do not call it in a process that
+    forks workers afterwards.
     """
+    if engine_nb is not None:
+        for kernel in engine_nb.BATCH_KERNELS.values():
+            kernel(np.array([8, 8], dtype=np.int8), 10, 1, np.uint64(1),
+                   RESOLVE_EV, 0.0, CHECK_EVERY, 0.0, 0.0, 0.0, 0.0)
+
+
+def _build_all_states() -> Tuple[Tuple[int, int, bool, bool], ...]:
+    """Enumerate every (player_total, dealer_upcard, is_soft, is_pair) state."""
     states = []
 
     # Hard totals: 5-21 (we skip 4 as it's only 2,2 which is a pair)
@@ -427,10 +439,30 @@ def generate_all_states() -> List[Tuple[int, int, bool, bool]]:
         for dealer in range(2, 12):
             states.append((pair_total, dealer, card == 11, True))
 
-    return states
+    return tuple(states)
+
+
+# The state space is fixed, so build it once at import
+_ALL_STATES = _build_all_states()
 
+# Row of each state in a StatsTable
+STATE_INDEX: Dict[Tuple[int, int, bool, bool], int] = {
+    state: i for i, state in enumerate(_ALL_STATES)
+}
 
-def get_cards_for_state(total: int, is_soft: bool, is_pair: bool) -> List[int]:
+
+def generate_all_states() -> Tuple[Tuple[int, int, bool, bool], ...]:
+    """
+    Generate all possible player states.
+
+    Returns:
+        Tuple of (player_total, dealer_upcard, is_soft, is_pair) tuples
+    """
+    return _ALL_STATES
+
+
+@lru_cache(maxsize=None)
+def get_cards_for_state(total: int, is_soft: bool, is_pair: bool) -> Tuple[int, ...]:
     """
     Generate cards that create a given state.
 
@@ -440,40 +472,41 @@ def get_cards_for_state(total: int, is_soft: bool, is_pair: bool) -> List[int]:
         is_pair: Whether hand is a pair
 
     Returns:
-        List of cards creating this state
+        Tuple of cards creating this state (shared, immutable)
     """
     if is_pair:
         # For pairs, return the two identical cards
         if is_soft:  # A,A
-            return [11, 11]
+            return (11, 11)
         else:
             card = total // 2
-            return [card, card]
+            return (card, card)
 
     if is_soft:
         # Soft hands: Ace + (total - 11)
         other = total - 11
         if other < 2:
             # Can't make this soft total with 2 cards, use 3
-            return [11, 2, other - 2] if other > 2 else [11, other]
-        return [11, other]
+            return (11, 2, other - 2) if other > 2 else (11, other)
+        return (11, other)
 
     # Hard hands: various combinations
     if total <= 11:
         # Small totals
-        return [2, total - 2] if total >= 4 else [total]
+        return (2, total - 2) if total >= 4 else (total,)
     elif total <= 19:
         # Use 10 + something
-        return [10, total - 10]
+        return (10, total - 10)
     else:
         # 20, 21
         if total == 20:
-            return [10, 10]
+            return (10, 10)
         else:  # 21
-            return [10, 10, 1]  # Need 3 cards for hard 21
+            return (10, 10, 1)  # Need 3 cards for hard 21
 
 
-def get_valid_actions(is_pair: bool, num_cards: int = 2) -> List[Action]:
+@lru_cache(maxsize=None)
+def get_valid_actions(is_pair: bool, num_cards: int = 2) -> Tuple[Action, ...]:
     """
     Get valid actions for a state.
 
@@ -482,7 +515,7 @@ def get_valid_actions(is_pair: bool, num_cards: int = 2) -> List[Action]:
         num_cards: Number of cards in hand
 
     Returns:
-        List of valid actions
+        Tuple of valid actions (shared, immutable)
     """
     actions = [Action.HIT, Action.STAND]
 
@@ -493,4 +526,21 @@ def get_valid_actions(is_pair: bool, num_cards: int = 2) -> List[Action]:
     if is_pair and num_cards == 2:
         actions.append(Action.SPLIT)
 
-    return actions
+    return tuple(actions)
+
+
+@lru_cache(maxsize=None)
+def get_valid_action_ids(is_pair: bool, num_cards: int = 2) -> np.ndarray:
+    """
+    Get valid action ids for a state, for fancy-indexing the action axis of stats arrays.
+
+    Args:
+        is_pair: Whether hand is a pair
+        num_cards: Number of cards in hand
+
+    Returns:
+        Read-only int8 array of action ids, in get_valid_actions order
+    """
+    ids = np.array(get_valid_actions(is_pair, num_cards), dtype=np.int8)
+    ids.flags.writeable = False
+    return ids
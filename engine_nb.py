@@ -0,0 +1,317 @@
+"""
+Numba-compiled kernels for the Monte Carlo hot loop.
+Hands are fixed-size int8 buffers plus a length instead of Python lists,
+cards come from a per-trial xorshift64* generator rather than the deck, and
+finished hands are scored from a precomputed expected-result table instead
+of drawing the dealer's cards.
+"""
+
+import numpy as np
+from numba import njit, prange
+
+from deck import CARD_LOOKUP, DOUBLE, HAND_BUF, HIT, SPLIT, STAND
+
+
+# Output multiplier of the xorshift64* generator
+XORSHIFT_STAR_MULT = np.uint64(2685821657736338717)
+
+# SplitMix64 constants, used to derive per-trial seeds from one batch seed
+SPLITMIX_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+SPLITMIX_MULT_1 = np.uint64(0xBF58476D1CE4E5B9)
+SPLITMIX_MULT_2 = np.uint64(0x94D049BB133111EB)
+
+# Trials per parallel work item; each item reuses one set of buffers
+TRIALS_PER_CHUNK = 256
+
+
+@njit(cache=True)
+def next_nb(rng):
+    """
+    Advance the xorshift64* generator held in the length-1 uint64 array rng.
+    The multiply scrambles the raw xorshift state, whose low bits are weak.
+    """
+    x = rng[0]
+    x ^= x << np.uint64(13)
+    x ^= x >> np.uint64(7)
+    x ^= x << np.uint64(17)
+    rng[0] = x
+    return x * XORSHIFT_STAR_MULT
+
+
+@njit(cache=True)
+def draw_nb(rng):
+    """Draw a card with infinite-deck probabilities."""
+    # Map the high 32 bits onto 0-12 without a modulo
+    x = next_nb(rng)
+    return CARD_LOOKUP[((x >> np.uint64(32)) * np.uint64(13)) >> np.uint64(32)]
+
+
+@njit(cache=True)
+def hand_value_nb(cards, n):
+    """Return (total, is_soft) for the first n cards of the buffer."""
+    total = 0
+    aces = 0
+    for i in range(n):
+        v = cards[i]
+        total += v
+        if v == 11:
+            aces += 1
+
+    while total > 21 and aces > 0:
+        total -= 10
+        aces -= 1
+
+    return total, aces > 0 and total <= 21
+
+
+@njit(cache=True)
+def add_card_nb(total, aces, v):
+    """Add card v to a running (total, aces counted as 11) pair."""
+    total += v
+    if v == 11:
+        aces += 1
+    while total > 21 and aces > 0:
+        total -= 10
+        aces -= 1
+    return total, aces
+
+
+@njit(cache=True)
+def play_hit_nb(cards, n, dealer_upcard, resolve_ev, rng):
+    """Hit once, then continue with the simplified hit/stand strategy."""
+    dealer_weak = 2 <= dealer_upcard <= 6
+    total, is_soft = hand_value_nb(cards, n)
+    aces = 1 if is_soft else 0
+
+    while True:
+        v = draw_nb(rng)
+        cards[n] = v
+        n += 1
+        total, aces = add_card_nb(total, aces, v)
+        if total > 21:
+            return -1.0
+        if total >= 17:
+            break
+        if aces == 0 and total >= 12 and dealer_weak:
+            break
+
+    return resolve_ev[dealer_upcard, total]
+
+
+@njit(cache=True)
+def play_double_nb(cards, n, dealer_upcard, resolve_ev, rng):
+    """Draw exactly one card at double stakes."""
+    total, is_soft = hand_value_nb(cards, n)
+    v = draw_nb(rng)
+    cards[n] = v
+    n += 1
+
+    total, _ = add_card_nb(total, 1 if is_soft else 0, v)
+    # Busted totals resolve to -1 in the table
+    return 2.0 * resolve_ev[dealer_upcard, total]
+
+
+@njit(cache=True)
+def play_split_hand_nb(cards, n, dealer_upcard, resolve_ev, rng, can_double):
+    """Play one split hand with the simplified hit/stand/double strategy."""
+    dealer_weak = 2 <= dealer_upcard <= 6
+    total, is_soft = hand_value_nb(cards, n)
+    aces = 1 if is_soft else 0
+
+    if can_double and n == 2:
+        if (not is_soft and 9 <= total <= 11) or (is_soft and 16 <= total <= 18):
+            return play_double_nb(cards, n, dealer_upcard, resolve_ev, rng)
+
+    while True:
+        if aces > 0:
+            if total >= 18:
+                break
+        else:
+            if total >= 17:
+                break
+            if total >= 12 and dealer_weak:
+                break
+
+        v = draw_nb(rng)
+        cards[n] = v
+        n += 1
+        total, aces = add_card_nb(total, aces, v)
+        if total > 21:
+            return -1.0
+
+    return resolve_ev[dealer_upcard, total]
+
+
+@njit(cache=True)
+def play_split_nb(cards, n, dealer_upcard, resolve_ev, rng, can_double):
+    """Split a pair into two hands; split aces get one card each."""
+    split_card = cards[0]
+    is_aces = split_card == 11
+    total_result = 0.0
+
+    for _ in range(2):
+        cards[0] = split_card
+        cards[1] = draw_nb(rng)
+
+        if is_aces:
+            total, _ = hand_value_nb(cards, 2)
+            total_result += resolve_ev[dealer_upcard, total]
+        else:
+            total_result += play_split_hand_nb(cards, 2, dealer_upcard, resolve_ev, rng,
+                                               can_double)
+
+    return total_result
+
+
+@njit(cache=True)
+def simulate_hand_nb(player_cards, dealer_upcard, action, hand_buf, resolve_ev,
+                     dealer_bj_prob, rng):
+    """
+    Simulate a single hand for the given action id.
+
+    Only the player's cards are drawn: finished hands are scored with their
+    expected result over the hole card and the dealer's play, and the
+    dealer-blackjack outcomes are weighted by dealer_bj_prob.
+    """
+    n = len(player_cards)
+    for i in range(n):
+        hand_buf[i] = player_cards[i]
+
+    # Player blackjack: push against dealer blackjack, otherwise paid 3:2
+    if n == 2 and player_cards[0] + player_cards[1] == 21:
+        return 1.5 * (1.0 - dealer_bj_prob)
+
+    if action == HIT:
+        return play_hit_nb(hand_buf, n, dealer_upcard, resolve_ev, rng)
+    elif action == STAND:
+        total, _ = hand_value_nb(hand_buf, n)
+        return resolve_ev[dealer_upcard, total]
+    elif action == DOUBLE:
+        return play_double_nb(hand_buf, n, dealer_upcard, resolve_ev, rng)
+    elif action == SPLIT:
+        return play_split_nb(hand_buf, n, dealer_upcard, resolve_ev, rng, True)
+
+    # Late surrender: dealer blackjack still takes the full bet under ENHC
+    return -0.5 - 0.5 * dealer_bj_prob
+
+
+@njit(cache=True)
+def seed_nb(rng, batch_seed, i):
+    """
+    Seed a xorshift64* state array in place for trial i of a batch.
+    SplitMix64 of the trial's position in the batch seed's sequence gives
+    well-mixed, independent states without generating a seed array.
+    """
+    z = batch_seed + np.uint64(i + 1) * SPLITMIX_GAMMA
+    z = (z ^ (z >> np.uint64(30))) * SPLITMIX_MULT_1
+    z = (z ^ (z >> np.uint64(27))) * SPLITMIX_MULT_2
+    z ^= z >> np.uint64(31)
+    rng[0] = z if z != 0 else SPLITMIX_GAMMA  # The state must be nonzero
+
+
+@njit(cache=True)
+def sem_nb(n, sum_x, sum_x_squared):
+    """Standard Error of the Mean from raw moments, matching engine.stats_sem."""
+    if n < 2:
+        return np.inf
+    mean = sum_x / n
+    var = max(sum_x_squared / n - mean * mean, 0.0)
+    return np.sqrt(var / n)
+
+
+@njit(inline="always")
+def _simulate_batch_nb(player_cards, dealer_upcard, action, batch_size, batch_seed,
+                       resolve_ev, dealer_bj_prob, check_every, target_sem, prior_n,
+                       prior_sum, prior_sum_squared):
+    """
+    Simulate up to batch_size independent hands in parallel.
+
+    Always inlined into one of the per-action kernels below, which pass the
+    action as a constant so the per-hand action dispatch is compiled away.
+
+    Each trial seeds its own generator from (batch_seed, i), so results do not
+    depend on how prange splits the work across threads. Trials run in chunks
+    of TRIALS_PER_CHUNK so each chunk allocates its hand and RNG buffers once.
+    fastmath lets the compiler reassociate the sum reductions.
+
+    Hands run in parallel rounds of check_every; after each round the SEM of
+    the prior (n, sum_x, sum_x_squared) plus the new results is checked, and
+    the batch stops early once it drops below target_sem (0 disables early
+    stopping). Callers size check_every so a round gives every thread a chunk.
+
+    Returns:
+        (n, sum_x, sum_x_squared) over the trials actually run
+    """
+    n = 0
+    sum_x = 0.0
+    sum_x_squared = 0.0
+    start = 0
+    while start < batch_size:
+        stop = min(start + check_every, batch_size)
+        num_chunks = (stop - start + TRIALS_PER_CHUNK - 1) // TRIALS_PER_CHUNK
+
+        round_n = 0
+        round_sum = 0.0
+        round_sum_squared = 0.0
+        for c in prange(num_chunks):
+            hand_buf = np.empty(HAND_BUF, dtype=np.int8)
+            rng = np.empty(1, dtype=np.uint64)
+
+            first = start + c * TRIALS_PER_CHUNK
+            for i in range(first, min(first + TRIALS_PER_CHUNK, stop)):
+                seed_nb(rng, batch_seed, i)
+                r = simulate_hand_nb(player_cards, dealer_upcard, action, hand_buf,
+                                     resolve_ev, dealer_bj_prob, rng)
+                round_n += 1
+                round_sum += r
+                round_sum_squared += r * r
+
+        n += round_n
+        sum_x += round_sum
+        sum_x_squared += round_sum_squared
+        start = stop
+
+        if target_sem > 0.0 and sem_nb(prior_n + n, prior_sum + sum_x,
+                                       prior_sum_squared + sum_x_squared) < target_sem:
+            break
+
+    return n, sum_x, sum_x_squared
+
+
+@njit(parallel=True, cache=True, fastmath=True)
+def simulate_hit_batch_nb(player_cards, dealer_upcard, batch_size, batch_seed, resolve_ev,
+                          dealer_bj_prob, check_every, target_sem, prior_n, prior_sum,
+                          prior_sum_squared):
+    """Batch kernel specialized for HIT; see _simulate_batch_nb."""
+    return _simulate_batch_nb(player_cards, dealer_upcard, HIT, batch_size, batch_seed,
+                              resolve_ev, dealer_bj_prob, check_every, target_sem, prior_n,
+                              prior_sum, prior_sum_squared)
+
+
+@njit(parallel=True, cache=True, fastmath=True)
+def simulate_double_batch_nb(player_cards, dealer_upcard, batch_size, batch_seed,
+                             resolve_ev, dealer_bj_prob, check_every, target_sem, prior_n,
+                             prior_sum, prior_sum_squared):
+    """Batch kernel specialized for DOUBLE; see _simulate_batch_nb."""
+    return _simulate_batch_nb(player_cards, dealer_upcard, DOUBLE, batch_size, batch_seed,
+                              resolve_ev, dealer_bj_prob, check_every, target_sem, prior_n,
+                              prior_sum, prior_sum_squared)
+
+
+@njit(parallel=True, cache=True, fastmath=True)
+def simulate_split_batch_nb(player_cards, dealer_upcard, batch_size, batch_seed, resolve_ev,
+                            dealer_bj_prob, check_every, target_sem, prior_n, prior_sum,
+                            prior_sum_squared):
+    """Batch kernel specialized for SPLIT; see _simulate_batch_nb."""
+    return _simulate_batch_nb(player_cards, dealer_upcard, SPLIT, batch_size, batch_seed,
+                              resolve_ev, dealer_bj_prob, check_every, target_sem, prior_n,
+                              prior_sum, prior_sum_squared)
+
+
+# Batch kernels by action id. Stand and surrender have fixed expected results,
+# so the engine never needs to play them out
+BATCH_KERNELS = {
+    HIT: simulate_hit_batch_nb,
+    DOUBLE: simulate_double_batch_nb,
+    SPLIT: simulate_split_batch_nb,
+}
@@ -0,0 +1,165 @@
+"""
+Vectorized NumPy simulation of whole batches, used when Numba is unavailable.
+Every trial plays the same simplified strategy as the Python engine, but the
+batch advances one draw at a time across all trials, with finished hands
+masked out, instead of looping over hands in the interpreter.
+"""
+
+from typing import Sequence, Tuple
+import numpy as np
+
+from deck import CARD_LOOKUP, DOUBLE, HIT, SPLIT, STAND, hand_value
+
+
+def draw_np(rng: np.random.Generator, size: int) -> np.ndarray:
+    """Draw size cards with infinite-deck probabilities, as int8 values."""
+    return CARD_LOOKUP[rng.integers(0, 13, size=size, dtype=np.int8)]
+
+
+def add_card_np(total: np.ndarray, aces: np.ndarray, cards: np.ndarray,
+                active: np.ndarray) -> None:
+    """
+    Add one card to the running (total, aces counted as 11) of every active trial.
+
+    Args:
+        total: Running hand totals, updated in place
+        aces: Aces still counted as 11, updated in place
+        cards: One drawn card per trial
+        active: Trials that take the card
+    """
+    cards = np.where(active, cards, 0)
+    total += cards
+    aces += cards == 11
+    # One card can push a soft total at most 11 past 21, so two passes suffice
+    for _ in range(2):
+        soften = (total > 21) & (aces > 0)
+        total -= 10 * soften
+        aces -= soften
+
+
+def resolve_np(player_total: np.ndarray, dealer_upcard: int,
+               resolve_ev: np.ndarray) -> np.ndarray:
+    """
+    Score finished player hands with their expected result against the dealer
+    (ENHC), looked up by total; busted hands score -1.
+
+    Returns:
+        Per-trial expected results (float32, like the table)
+    """
+    return resolve_ev[dealer_upcard, player_total]
+
+
+def play_hit_np(total: np.ndarray, aces: np.ndarray, dealer_upcard: int,
+                resolve_ev: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Hit once, then continue with the simplified hit/stand strategy."""
+    dealer_weak = 2 <= dealer_upcard <= 6
+    active = np.ones(len(total), dtype=bool)
+
+    while active.any():
+        add_card_np(total, aces, draw_np(rng, len(total)), active)
+        stand = (total >= 17) | ((aces == 0) & (total >= 12) & dealer_weak)
+        active &= ~stand & (total <= 21)
+
+    return resolve_np(total, dealer_upcard, resolve_ev)
+
+
+def play_double_np(total: np.ndarray, aces: np.ndarray, dealer_upcard: int,
+                   resolve_ev: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Draw exactly one card at double stakes."""
+    add_card_np(total, aces, draw_np(rng, len(total)), np.ones(len(total), dtype=bool))
+    return np.float32(2.0) * resolve_np(total, dealer_upcard, resolve_ev)
+
+
+def play_split_hand_np(total: np.ndarray, aces: np.ndarray, dealer_upcard: int,
+                       resolve_ev: np.ndarray, rng: np.random.Generator,
+                       can_double: bool) -> np.ndarray:
+    """Play two-card split hands with the simplified hit/stand/double strategy."""
+    dealer_weak = 2 <= dealer_upcard <= 6
+    soft = aces > 0
+
+    # Simple doubling logic: double on 9, 10, 11, soft 16-18
+    if can_double:
+        double = ((~soft & (total >= 9) & (total <= 11))
+                  | (soft & (total >= 16) & (total <= 18)))
+    else:
+        double = np.zeros(len(total), dtype=bool)
+    add_card_np(total, aces, draw_np(rng, len(total)), double)
+
+    # Hit the other hands until they reach a standing threshold
+    active = ~double
+    while True:
+        stand = np.where(aces > 0, total >= 18,
+                         (total >= 17) | ((total >= 12) & dealer_weak))
+        active &= ~stand & (total <= 21)
+        if not active.any():
+            break
+        add_card_np(total, aces, draw_np(rng, len(total)), active)
+
+    # Doubled hands count twice: add the result again under the mask
+    result = resolve_np(total, dealer_upcard, resolve_ev)
+    return result + result * double
+
+
+def play_split_np(split_card: int, dealer_upcard: int, batch_size: int,
+                  resolve_ev: np.ndarray, rng: np.random.Generator,
+                  can_double: bool) -> np.ndarray:
+    """Split a pair into two hands; split aces get one card each."""
+    total_result = np.zeros(batch_size, dtype=np.float32)
+
+    for _ in range(2):
+        total = np.full(batch_size, split_card, dtype=np.int8)
+        aces = np.full(batch_size, int(split_card == 11), dtype=np.int8)
+        add_card_np(total, aces, draw_np(rng, batch_size), np.ones(batch_size, dtype=bool))
+
+        if split_card == 11:
+            total_result += resolve_np(total, dealer_upcard, resolve_ev)
+        else:
+            total_result += play_split_hand_np(total, aces, dealer_upcard, resolve_ev, rng,
+                                               can_double)
+
+    return total_result
+
+
+def _reduce_np(results: np.ndarray) -> Tuple[int, float, float]:
+    """Reduce float32 per-hand results to (n, sum_x, sum_x_squared) in float64."""
+    wide = results.astype(np.float64)
+    return len(results), float(wide.sum()), float(wide @ wide)
+
+
+def simulate_batch_np(player_cards: Sequence[int], dealer_upcard: int, action: int,
+                      batch_size: int, resolve_ev: np.ndarray, dealer_bj_prob: float,
+                      rng: np.random.Generator) -> Tuple[int, float, float]:
+    """
+    Simulate batch_size independent hands of one state-action at once.
+    Only the player's cards are drawn; see engine_nb.simulate_hand_nb.
+
+    Cards and totals are int8 and per-hand results float32 (every total fits
+    in 31 and every result in [-2, 1.5]), halving the memory traffic of each
+    pass; the sums are still accumulated in float64.
+
+    Returns:
+        (n, sum_x, sum_x_squared) over all trials
+    """
+    # Player blackjack: push against dealer blackjack, otherwise paid 3:2
+    if len(player_cards) == 2 and player_cards[0] + player_cards[1] == 21:
+        results = np.full(batch_size, 1.5 * (1.0 - dealer_bj_prob), dtype=np.float32)
+        return _reduce_np(results)
+
+    start_total, is_soft = hand_value(player_cards)
+    total = np.full(batch_size, start_total, dtype=np.int8)
+    aces = np.full(batch_size, int(is_soft), dtype=np.int8)
+
+    if action == HIT:
+        results = play_hit_np(total, aces, dealer_upcard, resolve_ev, rng)
+    elif action == STAND:
+        results = resolve_np(total, dealer_upcard, resolve_ev)
+    elif action == DOUBLE:
+        results = play_double_np(total, aces, dealer_upcard, resolve_ev, rng)
+    elif action == SPLIT:
+        results = play_split_np(player_cards[0], dealer_upcard, batch_size, resolve_ev,
+                                rng, True)
+    else:
+        # Late surrender: dealer blackjack still takes the full bet under ENHC
+        results = np.full(batch_size, -0.5 - 0.5 * dealer_bj_prob, dtype=np.float32)
+
+    return _reduce_np(results)
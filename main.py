@@ -4,17 +4,18 @@ Uses multiprocessing to parallelize Monte Carlo simulations.
 """
 
 import multiprocessing as mp
-from multiprocessing import Manager
-from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
+import os
+from functools import partial
+from multiprocessing import shared_memory
+from typing import Sequence, Tuple, Optional
 import time
 import sys
-from collections import defaultdict
+import numpy as np
 
-from deck import hand_value
 from engine import (
-    BlackjackEngine, Action, ActionStats, StateStats,
-    generate_all_states, get_cards_for_state, get_valid_actions
+    BlackjackEngine, Action, StatsTable, ACTION_CHAR, NUM_ACTIONS,
+    STATE_INDEX, generate_all_states, get_cards_for_state, get_valid_actions, stats_sem,
+    set_kernel_threads, warmup_kernels
 )
 
 
@@ -22,46 +23,163 @@ from engine import (
 TARGET_SEM = 0.005
 BATCH_SIZE = 10000
 MAX_ITERATIONS = 1000  # Safety limit per state
+TASKS_PER_BATCH = 16  # State-actions simulated per worker call
+
+# Shape of the statistics array shared between the workers and the parent
+STATS_SHAPE = (len(STATE_INDEX), NUM_ACTIONS, 3)
+
+# Static description of one state-action; the whole table is shared with the
+# workers once, so each round only sends task ids through the pickle stream
+MAX_PLAYER_CARDS = 3
+TASK_DTYPE = np.dtype([
+    ("cards", np.int8, (MAX_PLAYER_CARDS,)),  # Player's starting cards, zero-padded
+    ("num_cards", np.int8),
+    ("dealer", np.int8),
+    ("action", np.int8),
+    ("state", np.int16),  # Row of the state in STATE_INDEX and the stats array
+])
+
+# Strategy table header rows, one column per dealer upcard (2-10, then Ace)
+_DEALER_CARDS = ("2", "3", "4", "5", "6", "7", "8", "9", "10", "A")
+_TABLE_HEADER = "| Hand | " + " | ".join(_DEALER_CARDS) + " |"
+_TABLE_SEP = "|------|" + "|".join(["---"] * len(_DEALER_CARDS)) + "|"
+
+# Worker-side views of the shared blocks, set up by _init_worker
+_shared_blocks: Tuple[shared_memory.SharedMemory, ...] = ()
+_shared_stats: Optional[np.ndarray] = None
+_task_table: Optional[np.ndarray] = None
+_run_entropy: int = 0
+_ENGINE: Optional[BlackjackEngine] = None
+
+
+def _build_task_table(all_states: Sequence[Tuple[int, int, bool, bool]]) -> np.ndarray:
+    """
+    Describe every valid state-action as one TASK_DTYPE row.
+
+    Args:
+        all_states: States to simulate
+
+    Returns:
+        Task table indexed by task id
+    """
+    rows = []
+    for state in all_states:
+        total, dealer_upcard, is_soft, is_pair = state
+        player_cards = get_cards_for_state(total, is_soft, is_pair)
+        padded = player_cards + (0,) * (MAX_PLAYER_CARDS - len(player_cards))
 
+        for action in get_valid_actions(is_pair):
+            rows.append((padded, len(player_cards), dealer_upcard, action, STATE_INDEX[state]))
 
-@dataclass
-class SimulationTask:
-    """A task for the worker pool."""
-    state: Tuple[int, int, bool, bool]  # (total, dealer_upcard, is_soft, is_pair)
-    action: Action
-    player_cards: List[int]
-    dealer_upcard: int
+    return np.array(rows, dtype=TASK_DTYPE)
 
 
-@dataclass
-class SimulationResult:
-    """Result from a simulation batch."""
-    state: Tuple[int, int, bool, bool]
-    action: Action
-    stats: ActionStats
+def _create_shared(template: np.ndarray) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Allocate a shared memory block holding a copy of template."""
+    shm = shared_memory.SharedMemory(create=True, size=max(template.nbytes, 1))
+    array = np.ndarray(template.shape, dtype=template.dtype, buffer=shm.buf)
+    array[...] = template
+    return shm, array
 
 
-def worker_simulate(task: SimulationTask) -> SimulationResult:
+def _pin_worker(worker_counter, num_workers: int) -> None:
     """
-    Worker function to simulate a batch of hands.
+    Pin the calling worker to its own share of the cores, so its engine and
+    tables stay in those cores' caches instead of following the process around.
+
+    The cores the workers inherited are dealt out round-robin, so together the
+    workers still cover every core even when there are fewer workers than
+    cores. The Numba kernels are parallel, so the worker's kernel thread pool
+    is sized to its share: a full cpu_count pool squeezed onto one core would
+    only time-slice and wait at every prange barrier. Where pinning is not
+    available the pool is still sized to cpu_count / num_workers threads.
 
     Args:
-        task: SimulationTask with state and action info
+        worker_counter: Shared multiprocessing.Value('i') handing out worker numbers
+        num_workers: Number of workers in the pool
+    """
+    with worker_counter.get_lock():
+        worker_id = worker_counter.value
+        worker_counter.value += 1
+
+    try:
+        cores = sorted(os.sched_getaffinity(0))
+        own_cores = cores[worker_id % len(cores)::num_workers]
+        os.sched_setaffinity(0, own_cores)
+        num_threads = len(own_cores)
+    except (AttributeError, OSError):
+        # Not supported on this platform: leave the worker unpinned, but still
+        # split the CPUs between the workers' kernel thread pools
+        num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+    set_kernel_threads(num_threads)
+
+
+def _init_worker(stats_name: str, tasks_name: str, num_tasks: int, run_entropy: int,
+                 worker_counter, num_workers: int) -> None:
+    """
+    Pool initializer: pin the worker to a core, attach the shared statistics
+    and task table, build the worker's engine once, and warm up the kernels.
+    """
+    global _shared_blocks, _shared_stats, _task_table, _run_entropy, _ENGINE
+    _pin_worker(worker_counter, num_workers)
+    stats_shm = shared_memory.SharedMemory(name=stats_name)
+    tasks_shm = shared_memory.SharedMemory(name=tasks_name)
+    _shared_blocks = (stats_shm, tasks_shm)  # Keep the mappings alive
+    _shared_stats = np.ndarray(STATS_SHAPE, dtype=np.float64, buffer=stats_shm.buf)
+    _task_table = np.ndarray((num_tasks,), dtype=TASK_DTYPE, buffer=tasks_shm.buf)
+    _run_entropy = run_entropy
+    _ENGINE = BlackjackEngine(use_infinite_deck=True)
+    warmup_kernels()
+
+
+def worker_simulate(task_id: int, engine: Optional[BlackjackEngine] = None,
+                    iteration: int = 0) -> None:
+    """
+    Worker function to simulate a batch of hands.
+    The state-action is read from the shared task table and results are added
+    straight into the shared statistics array, so only the id is pickled.
 
-    Returns:
-        SimulationResult with statistics
+    The batch is seeded from (run, state, iteration), so every action of a
+    state plays the same card stream in a given round (common random numbers).
+    Convergence is still judged per action, so this does not cut the rounds
+    needed; it only makes the run reproducible given its entropy.
+
+    Args:
+        task_id: Row of the state-action in the task table
+        engine: Engine to simulate with (default: the worker's engine)
+        iteration: Round of the simulation loop
     """
-    engine = BlackjackEngine(use_infinite_deck=True)
-    stats = engine.simulate_batch(
-        task.player_cards,
-        task.dealer_upcard,
-        task.action,
-        BATCH_SIZE
+    if engine is None:
+        engine = _ENGINE
+    task = _task_table[task_id]
+    # Each state-action is queued at most once per round, so no two workers
+    # ever touch the same cell concurrently
+    cell = _shared_stats[task["state"], task["action"]]
+    cell += engine.simulate_batch(
+        tuple(task["cards"][:task["num_cards"]].tolist()),
+        int(task["dealer"]),
+        Action(task["action"]),
+        BATCH_SIZE,
+        target_sem=TARGET_SEM,
+        prior=cell,
+        entropy=(_run_entropy, int(task["state"]), iteration)
     )
-    return SimulationResult(task.state, task.action, stats)
 
 
-def run_simulation(num_workers: Optional[int] = None, verbose: bool = True) -> Dict:
+def worker_simulate_batch(task_ids: Sequence[int], iteration: int = 0) -> None:
+    """
+    Worker function to simulate several state-actions in one call.
+    Batching amortizes the per-call IPC.
+
+    Args:
+        task_ids: Task table rows to run, each a distinct state-action
+        iteration: Round of the simulation loop
+    """
+    for task_id in task_ids:
+        worker_simulate(task_id, _ENGINE, iteration)
+
+
+def run_simulation(num_workers: Optional[int] = None, verbose: bool = True) -> StatsTable:
     """
     Run the full Monte Carlo simulation to find optimal strategy.
 
@@ -70,7 +188,7 @@ def run_simulation(num_workers: Optional[int] = None, verbose: bool = True) -> D
         verbose: Print progress updates
 
     Returns:
-        Dictionary mapping states to StateStats
+        StatsTable mapping states to StateStats
     """
     if num_workers is None:
         num_workers = mp.cpu_count()
@@ -85,61 +203,69 @@ def run_simulation(num_workers: Optional[int] = None, verbose: bool = True) -> D
     if verbose:
         print(f"Total states to analyze: {len(all_states)}")
 
-    # Initialize state statistics
-    state_stats: Dict[Tuple, StateStats] = {}
-    for state in all_states:
-        state_stats[state] = StateStats()
-
-    # Track which state-actions need more simulation
-    pending_tasks = []
-    for state in all_states:
-        total, dealer_upcard, is_soft, is_pair = state
-        player_cards = get_cards_for_state(total, is_soft, is_pair)
-        valid_actions = get_valid_actions(is_pair)
+    # Initialize state statistics in shared memory so workers can update them in place,
+    # next to the task table describing every state-action
+    stats_shm, shared_data = _create_shared(np.zeros(STATS_SHAPE, dtype=np.float64))
+    tasks_shm, task_table = _create_shared(_build_task_table(all_states))
 
-        for action in valid_actions:
-            task = SimulationTask(state, action, player_cards, dealer_upcard)
-            pending_tasks.append(task)
+    # State-actions that still need more simulation, and their task ids
+    total_pairs = len(task_table)
+    active_mask = np.ones(total_pairs, dtype=bool)
+    pending_tasks = np.arange(total_pairs, dtype=np.int32)
 
     if verbose:
-        print(f"Total state-action pairs: {len(pending_tasks)}")
+        print(f"Total state-action pairs: {total_pairs}")
         print()
 
     # Run simulation in parallel
     start_time = time.time()
     iteration = 0
-    converged_count = 0
-
-    with mp.Pool(num_workers) as pool:
-        while pending_tasks and iteration < MAX_ITERATIONS:
-            iteration += 1
-
-            if verbose and iteration % 5 == 1:
-                elapsed = time.time() - start_time
-                remaining = len(pending_tasks)
-                total_pairs = sum(
-                    len(get_valid_actions(s[3])) for s in all_states
-                )
-                converged = total_pairs - remaining
-                print(f"Iteration {iteration}: {converged}/{total_pairs} converged "
-                      f"({100*converged/total_pairs:.1f}%), "
-                      f"elapsed: {elapsed:.1f}s")
-
-            # Run batch in parallel
-            results = pool.map(worker_simulate, pending_tasks)
-
-            # Update statistics
-            for result in results:
-                state_stats[result.state].actions[result.action].merge(result.stats)
-
-            # Filter out converged state-actions
-            new_pending = []
-            for task in pending_tasks:
-                stats = state_stats[task.state].actions[task.action]
-                if stats.sem() >= TARGET_SEM:
-                    new_pending.append(task)
-
-            pending_tasks = new_pending
+
+    # Fresh entropy per run; rounds and states are mixed in by the workers
+    run_entropy = np.random.SeedSequence().entropy
+
+    def _retire_converged(task_ids: np.ndarray, _result: None = None) -> None:
+        """Clear the converged state-actions of a finished batch from the mask."""
+        cells = shared_data[task_table["state"][task_ids], task_table["action"][task_ids]]
+        active_mask[task_ids] &= stats_sem(cells) >= TARGET_SEM
+
+    try:
+        with mp.Pool(num_workers, initializer=_init_worker,
+                     initargs=(stats_shm.name, tasks_shm.name, len(task_table),
+                               run_entropy, mp.Value("i", 0), num_workers)) as pool:
+            while len(pending_tasks) and iteration < MAX_ITERATIONS:
+                iteration += 1
+
+                if verbose and iteration % 5 == 1:
+                    elapsed = time.time() - start_time
+                    converged = total_pairs - len(pending_tasks)
+                    print(f"Iteration {iteration}: {converged}/{total_pairs} converged "
+                          f"({100*converged/total_pairs:.1f}%), "
+                          f"elapsed: {elapsed:.1f}s")
+
+                # Run batch in parallel; workers update shared_data in place.
+                # Coalesce state-actions into batches; each batch's convergence
+                # check runs in the result thread as soon as it finishes, while
+                # slower batches are still running. Callbacks run one at a time
+                # and touch disjoint mask entries, so no lock is needed
+                batches = [pending_tasks[i:i + TASKS_PER_BATCH]
+                           for i in range(0, len(pending_tasks), TASKS_PER_BATCH)]
+                results = [pool.apply_async(worker_simulate_batch, (batch, iteration),
+                                            callback=partial(_retire_converged, batch))
+                           for batch in batches]
+                for result in results:
+                    result.get()  # Re-raises worker errors
+
+                pending_tasks = np.flatnonzero(active_mask).astype(np.int32)
+
+        # Copy the results out of the shared blocks before releasing them
+        state_stats = StatsTable(data=shared_data.copy())
+        del shared_data, task_table
+        stats_shm.close()
+        tasks_shm.close()
+    finally:
+        stats_shm.unlink()
+        tasks_shm.unlink()
 
     elapsed = time.time() - start_time
 
@@ -149,59 +275,44 @@ def run_simulation(num_workers: Optional[int] = None, verbose: bool = True) -> D
         print(f"Final iteration: {iteration}")
 
         # Check convergence
-        not_converged = []
-        for state, ss in state_stats.items():
-            for action, stats in ss.actions.items():
-                if stats.n > 0 and stats.sem() >= TARGET_SEM:
-                    not_converged.append((state, action, stats.sem()))
+        simulated = state_stats.data[..., 0] > 0
+        not_converged = int(np.sum(simulated & (stats_sem(state_stats.data) >= TARGET_SEM)))
 
         if not_converged:
-            print(f"Warning: {len(not_converged)} state-actions did not converge")
+            print(f"Warning: {not_converged} state-actions did not converge")
         else:
             print("All state-actions converged to target SEM")
 
     return state_stats
 
 
-def format_strategy_tables(state_stats: Dict) -> str:
+def format_strategy_tables(state_stats: StatsTable) -> str:
     """
     Format the optimal strategy as Markdown tables.
 
     Args:
-        state_stats: Dictionary mapping states to StateStats
+        state_stats: StatsTable mapping states to StateStats
 
     Returns:
         Markdown formatted strategy tables
     """
     output = []
 
-    # Dealer upcards header
-    dealer_cards = ["2", "3", "4", "5", "6", "7", "8", "9", "10", "A"]
-
-    # Action symbols
-    action_symbols = {
-        Action.HIT: "H",
-        Action.STAND: "S",
-        Action.DOUBLE: "D",
-        Action.SPLIT: "P",
-        Action.SURRENDER: "R"
-    }
+    # Best action id for every state, indexed by STATE_INDEX
+    best = state_stats.best_actions()
 
     # Hard totals table
     output.append("## Hard Totals Strategy")
     output.append("")
-    output.append("| Hand | " + " | ".join(dealer_cards) + " |")
-    output.append("|------|" + "|".join(["---"] * 10) + "|")
+    output.append(_TABLE_HEADER)
+    output.append(_TABLE_SEP)
 
     for total in range(17, 4, -1):  # 17 down to 5
         row = [f"**{total}**"]
         for dealer in range(2, 12):
-            dealer_up = 11 if dealer == 11 else dealer
-            state = (total, dealer_up, False, False)
+            state = (total, dealer, False, False)
             if state in state_stats:
-                best_action, ev = state_stats[state].best_action()
-                symbol = action_symbols[best_action]
-                row.append(symbol)
+                row.append(ACTION_CHAR[best[STATE_INDEX[state]]])
             else:
                 row.append("-")
         output.append("| " + " | ".join(row) + " |")
@@ -211,18 +322,15 @@ def format_strategy_tables(state_stats: Dict) -> str:
     # Soft totals table
     output.append("## Soft Totals Strategy")
     output.append("")
-    output.append("| Hand | " + " | ".join(dealer_cards) + " |")
-    output.append("|------|" + "|".join(["---"] * 10) + "|")
+    output.append(_TABLE_HEADER)
+    output.append(_TABLE_SEP)
 
     for total in range(20, 12, -1):  # A,9 down to A,2 (A,10 is blackjack)
         row = [f"**A,{total-11}**"]
         for dealer in range(2, 12):
-            dealer_up = 11 if dealer == 11 else dealer
-            state = (total, dealer_up, True, False)
+            state = (total, dealer, True, False)
             if state in state_stats:
-                best_action, ev = state_stats[state].best_action()
-                symbol = action_symbols[best_action]
-                row.append(symbol)
+                row.append(ACTION_CHAR[best[STATE_INDEX[state]]])
             else:
                 row.append("-")
         output.append("| " + " | ".join(row) + " |")
@@ -232,8 +340,8 @@ def format_strategy_tables(state_stats: Dict) -> str:
     # Pairs table
     output.append("## Pairs Strategy")
     output.append("")
-    output.append("| Hand | " + " | ".join(dealer_cards) + " |")
-    output.append("|------|" + "|".join(["---"] * 10) + "|")
+    output.append(_TABLE_HEADER)
+    output.append(_TABLE_SEP)
 
     pair_order = [11, 10, 9, 8, 7, 6, 5, 4, 3, 2]  # A,A down to 2,2
     for card in pair_order:
@@ -248,12 +356,9 @@ def format_strategy_tables(state_stats: Dict) -> str:
 
         row = [label]
         for dealer in range(2, 12):
-            dealer_up = 11 if dealer == 11 else dealer
-            state = (total, dealer_up, is_soft, True)
+            state = (total, dealer, is_soft, True)
             if state in state_stats:
-                best_action, ev = state_stats[state].best_action()
-                symbol = action_symbols[best_action]
-                row.append(symbol)
+                row.append(ACTION_CHAR[best[STATE_INDEX[state]]])
             else:
                 row.append("-")
         output.append("| " + " | ".join(row) + " |")
@@ -282,7 +387,7 @@ def format_strategy_tables(state_stats: Dict) -> str:
     return "\n".join(output)
 
 
-def print_ev_details(state_stats: Dict) -> None:
+def print_ev_details(state_stats: StatsTable) -> None:
     """Print detailed EV information for each state-action."""
     print("\n## Detailed EV Analysis")
     print()
@@ -302,7 +407,7 @@ def print_ev_details(state_stats: Dict) -> None:
                 for action in [Action.HIT, Action.STAND, Action.DOUBLE]:
                     stats = ss.actions[action]
                     if stats.n > 0:
-                        evs.append(f"{action.value}={stats.ev():.4f}")
+                        evs.append(f"{action.symbol}={stats.ev():.4f}")
                 print(f"  vs {dealer_str}: {', '.join(evs)}")
         print()
 
@@ -315,8 +420,12 @@ def main():
     print("=" * 60)
     print()
 
-    # Run simulation
-    state_stats = run_simulation(verbose=True)
+    # Exact backward-induction EVs on request, Monte Carlo otherwise
+    if "--analytic" in sys.argv[1:]:
+        from analytic import solve_analytic
+        state_stats = solve_analytic()
+    else:
+        state_stats = run_simulation(verbose=True)
 
     print()
     print("=" * 60)